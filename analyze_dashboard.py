@@ -7,41 +7,71 @@ Features:
 - Interactive filtering and sorting
 """
 
+import html
 import pandas as pd
-import json
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime
-import os
+from log_cache import load_messages_df
 
-def load_log_file():
-    """Load the download log JSON file"""
-    log_file = 'download_log.json'
-    if not os.path.exists(log_file):
-        raise FileNotFoundError(f"Could not find {log_file}")
-        
-    with open(log_file, 'r') as f:
-        return json.load(f)
+def figure_html(fig, div_id):
+    """Render a figure as an empty <div> that plotly.js draws from the figure's JSON"""
+    # Escape '</' so text inside the figure can't close the <script> tag
+    fig_json = fig.to_json().replace('</', '<\\/')
+    return (
+        f'<div id="{div_id}"></div>'
+        f'<script>Plotly.newPlot("{div_id}", '
+        f'Object.assign({fig_json}, {{config: {{responsive: true}}}}));</script>'
+    )
+
+def top_messages_html(df, n=10):
+    """Render the n most reacted messages as an HTML table"""
+    columns = ['reply_name', 'reply_text', 'total_reactions', 'url']
+    
+    # Stable sort on the reaction column alone: ties keep log order, same rows as nlargest
+    idx = np.argsort(-df['total_reactions'].values, kind='stable')[:n]
+    
+    def cell(value):
+        return '' if pd.isna(value) else html.escape(str(value))
+    
+    header = ''.join(f'<th>{c}</th>' for c in columns)
+    rows = ''.join(
+        f'<tr><td>{cell(m.reply_name)}</td><td>{cell(m.reply_text)}</td>'
+        f'<td>{m.total_reactions}</td>'
+        f'<td><a href="{cell(m.url)}" target="_blank">{cell(m.url)}</a></td></tr>'
+        for m in df.iloc[idx][columns].itertuples(index=False)
+    )
+    return f'<table class="dataframe"><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>'
 
 def generate_dashboard():
-    log_data = load_log_file()
+    # Plotly's import registers hundreds of classes; only pay for it when drawing
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.offline import get_plotlyjs_version
     
-    # Convert to DataFrame
-    df = pd.DataFrame.from_dict(log_data['messages'], orient='index')
-    df['date'] = pd.to_datetime(df['date_iso'])
+    df = load_messages_df()
+    df['date'] = pd.to_datetime(df['date_iso'], format='ISO8601', cache=True)
     
-    # Add total reactions to DataFrame
-    df['total_reactions'] = df['reactions'].apply(lambda x: sum(r['count'] for r in x))
+    # Derive calendar fields once so each groupby reuses them
+    dt = df['date'].dt
+    df['hour'] = dt.hour
+    df['day'] = dt.normalize()
+    df['month'] = dt.tz_localize(None).dt.to_period('M').astype(str)
     
-    # Create timestamp for filename
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+    # Create timestamp for filename; the page footer uses the same moment
+    now = datetime.now()
+    timestamp = now.strftime('%Y%m%d_%H%M')
+    generated_at = now.strftime('%Y-%m-%d %H:%M:%S')
     filename = f'telegram_dashboard_{timestamp}.html'
     
     # Create visualizations
-    fig1 = px.bar(df.groupby('reply_name')['total_reactions'].sum().sort_values(ascending=False).reset_index(), 
-                  x='reply_name', y='total_reactions', 
-                  title='Total Reactions by User',
-                  labels={'reply_name': 'User', 'total_reactions': 'Total Reactions'})
+    user_reactions = (
+        df.groupby('reply_name', observed=True)['total_reactions']
+        .sum()
+        .sort_values(ascending=False)
+    )
+    fig1 = go.Figure(go.Bar(x=user_reactions.index, y=user_reactions.values))
+    fig1.update_layout(title='Total Reactions by User',
+                       xaxis_title='User', yaxis_title='Total Reactions')
     
     fig2 = px.scatter(df, x='date', y='total_reactions', 
                       hover_data=['reply_name', 'reply_text', 'url'],
@@ -49,58 +79,58 @@ def generate_dashboard():
                       labels={'date': 'Date', 'total_reactions': 'Reactions'})
     
     # Add daily aggregation
-    daily_msgs = df.groupby(df['date'].dt.date).size().reset_index()
-    daily_msgs.columns = ['date', 'count']
-    fig3 = px.bar(daily_msgs, x='date', y='count',
-                  title='Messages per Day',
-                  labels={'date': 'Date', 'count': 'Message Count'})
+    days, day_counts = np.unique(df['day'].values, return_counts=True)
+    fig3 = go.Figure(go.Bar(x=days, y=day_counts))
+    fig3.update_layout(title='Messages per Day',
+                       xaxis_title='Date', yaxis_title='Message Count')
     
     # Add reaction type analysis
-    reaction_types = pd.DataFrame([
-        {'emoji': r['emoji'], 'count': r['count']}
-        for msg in df['reactions'] 
-        for r in msg
-    ])
-    fig4 = px.pie(reaction_types.groupby('emoji')['count'].sum().reset_index(), 
-                  values='count', names='emoji',
-                  title='Distribution of Reaction Types')
+    reactions = pd.json_normalize(df['reactions'].explode().dropna().tolist())
+    reaction_types = reactions.groupby('emoji', sort=False)['count'].sum().reset_index()
+    fig4 = go.Figure(go.Pie(labels=reaction_types['emoji'].values,
+                            values=reaction_types['count'].values))
+    fig4.update_layout(title='Distribution of Reaction Types')
 
     # Add top messages table
-    top_msgs = df.nlargest(10, 'total_reactions')[
-        ['reply_name', 'reply_text', 'total_reactions', 'url']
-    ].to_html(index=False, render_links=True)
+    top_msgs = top_messages_html(df)
 
     # Add time of day analysis
-    df['hour'] = df['date'].dt.hour
-    hourly_activity = px.bar(
-        df.groupby('hour').size().reset_index(),
-        x='hour', y=0,
-        title='Activity by Hour of Day',
-        labels={'hour': 'Hour', '0': 'Message Count'}
-    )
+    hour_counts = np.bincount(df['hour'].values, minlength=24)
+    hourly_activity = go.Figure(go.Bar(x=np.arange(24), y=hour_counts))
+    hourly_activity.update_layout(title='Activity by Hour of Day',
+                                  xaxis_title='Hour', yaxis_title='Message Count')
 
     # Add user engagement over time - fixed version
-    monthly_users = df.groupby([
-        df['date'].dt.strftime('%Y-%m'),  # Use string format instead of Period
-        'reply_name'
-    ]).size().reset_index()
+    monthly_users = df.groupby(['month', 'reply_name'], observed=True).size().reset_index()
     monthly_users.columns = ['month', 'user', 'messages']
     
     monthly_activity = px.line(
-        monthly_users.pivot(
-            index='month',
-            columns='user',
-            values='messages'
-        ).fillna(0),
+        monthly_users,
+        x='month', y='messages', color='user',
         title='User Activity Over Time',
-        labels={'value': 'Messages', 'variable': 'User'}
+        labels={'month': 'Month', 'messages': 'Messages', 'user': 'User'}
     )
 
+    # Summary stats for the header grid; the average reuses the total
+    total_msgs = len(df)
+    total_reactions = int(df['total_reactions'].values.sum())
+    active_users = df['reply_name'].nunique()
+    avg_reactions = total_reactions / total_msgs if total_msgs else 0.0
+
+    # Ship each figure as JSON and let plotly.js (loaded once in <head>) render it
+    fig1_html = figure_html(fig1, 'fig1')
+    fig2_html = figure_html(fig2, 'fig2')
+    fig3_html = figure_html(fig3, 'fig3')
+    hourly_html = figure_html(hourly_activity, 'hourly')
+    fig4_html = figure_html(fig4, 'fig4')
+    monthly_html = figure_html(monthly_activity, 'monthly')
+
     # Generate HTML
     dashboard_html = f"""
     <html>
         <head>
             <title>Telegram Stats Dashboard</title>
+            <script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>
             <style>
                 body {{ font-family: Arial, sans-serif; margin: 20px; }}
                 .plot {{ margin-bottom: 30px; }}
@@ -135,46 +165,47 @@ def generate_dashboard():
             <div class="stats-grid">
                 <div class="stat-box">
                     <h3>Total Messages</h3>
-                    <p>{len(df):,}</p>
+                    <p>{total_msgs:,}</p>
                 </div>
                 <div class="stat-box">
                     <h3>Total Reactions</h3>
-                    <p>{df['total_reactions'].sum():,}</p>
+                    <p>{total_reactions:,}</p>
                 </div>
                 <div class="stat-box">
                     <h3>Active Users</h3>
-                    <p>{df['reply_name'].nunique():,}</p>
+                    <p>{active_users:,}</p>
                 </div>
                 <div class="stat-box">
                     <h3>Avg Reactions/Message</h3>
-                    <p>{df['total_reactions'].mean():.1f}</p>
+                    <p>{avg_reactions:.1f}</p>
                 </div>
             </div>
 
             <h2>User Engagement</h2>
-            <div class="plot">{fig1.to_html()}</div>
+            <div class="plot">{fig1_html}</div>
             
             <h2>Temporal Analysis</h2>
-            <div class="plot">{fig2.to_html()}</div>
-            <div class="plot">{fig3.to_html()}</div>
-            <div class="plot">{hourly_activity.to_html()}</div>
+            <div class="plot">{fig2_html}</div>
+            <div class="plot">{fig3_html}</div>
+            <div class="plot">{hourly_html}</div>
             
             <h2>Reaction Analysis</h2>
-            <div class="plot">{fig4.to_html()}</div>
+            <div class="plot">{fig4_html}</div>
             
             <h2>User Trends</h2>
-            <div class="plot">{monthly_activity.to_html()}</div>
+            <div class="plot">{monthly_html}</div>
             
             <h2>Top 10 Most Reacted Messages</h2>
             {top_msgs}
             
-            <p>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+            <p>Generated: {generated_at}</p>
         </body>
     </html>
     """
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(dashboard_html)
+    # Encode once and hand the OS a single buffer instead of text-IO chunks
+    with open(filename, 'wb') as f:
+        f.write(dashboard_html.encode('utf-8'))
     
     print(f"Dashboard generated: {filename}")
 
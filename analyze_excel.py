@@ -8,49 +8,49 @@ Provides sortable sheets for:
 
 import pandas as pd
 import json
-import os
 from datetime import datetime
+from log_cache import load_messages_df
 
-def load_log_file():
-    """Load the download log JSON file"""
-    log_file = 'download_log.json'
-    if not os.path.exists(log_file):
-        raise FileNotFoundError(f"Could not find {log_file}")
-        
-    with open(log_file, 'r') as f:
-        return json.load(f)
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITER_KWARGS = {
+        'engine': 'xlsxwriter',
+        # Skip the per-cell URL/formula detection; the log holds plain text
+        'engine_kwargs': {'options': {'strings_to_urls': False, 'strings_to_formulas': False}}
+    }
+except ImportError:
+    EXCEL_WRITER_KWARGS = {}
 
 def export_excel_report():
-    log_data = load_log_file()
-    
-    # Convert messages to DataFrame
-    df = pd.DataFrame.from_dict(log_data['messages'], orient='index')
-    
-    # Add total reaction count column
-    df['total_reactions'] = df['reactions'].apply(lambda x: sum(r['count'] for r in x))
+    df = load_messages_df()
     
     # Create timestamp for filename
     timestamp = datetime.now().strftime('%Y%m%d_%H%M')
     filename = f'telegram_stats_{timestamp}.xlsx'
     
     # Export to Excel with multiple sheets
-    with pd.ExcelWriter(filename) as writer:
-        # Full data
-        df.to_excel(writer, sheet_name='All Messages')
+    with pd.ExcelWriter(filename, **EXCEL_WRITER_KWARGS) as writer:
+        # Full data, with reactions pre-serialized so the writer doesn't repr() each list
+        df.assign(
+            reactions=[json.dumps(r, ensure_ascii=False, separators=(',', ':')) for r in df['reactions']]
+        ).to_excel(writer, sheet_name='All Messages', index=False)
         
         # User summary
-        user_stats = df.groupby('reply_name').agg({
-            'id': 'count',
-            'total_reactions': 'sum'
-        }).reset_index()
-        user_stats.columns = ['User', 'Message Count', 'Total Reactions']
+        by_user = df.groupby('reply_name', observed=True)
+        user_stats = pd.DataFrame({
+            'Message Count': by_user['id'].count(),
+            'Total Reactions': by_user['total_reactions'].sum()
+        }).rename_axis('User').reset_index()
         user_stats.sort_values('Total Reactions', ascending=False, inplace=True)
         user_stats.to_excel(writer, sheet_name='User Stats', index=False)
         
         # Reaction summary
-        reaction_counts = df.groupby('reply_name')['reactions'].apply(
-            lambda x: pd.Series([r['emoji'] for msgs in x for r in msgs]).value_counts()
-        ).fillna(0)
+        reactions = (
+            df[['reply_name', 'reactions']]
+            .explode('reactions', ignore_index=True)
+            .dropna(subset=['reactions'])
+        )
+        reaction_counts = pd.crosstab(reactions['reply_name'], reactions['reactions'].str['emoji'])
         reaction_counts.to_excel(writer, sheet_name='Reaction Types')
     
     print(f"Excel report generated: {filename}")
@@ -8,7 +8,7 @@ from dotenv import load_dotenv
 import argparse
 from telethon import TelegramClient
 import asyncio
-import re
+from urllib.parse import urlparse
 
 # Parse arguments
 parser = argparse.ArgumentParser(description='Download a single Telegram message and show debug info')
@@ -20,12 +20,12 @@ load_dotenv()
 api_id = os.getenv('API_ID')
 api_hash = os.getenv('API_HASH')
 
-# Parse URL
-match = re.match(r'https?://t\.me/([^/]+)/(\d+)', args.url)
-if not match:
+# Parse URL before connecting, so bad input fails without a Telegram round-trip
+url = urlparse(args.url)
+parts = url.path.strip('/').split('/')
+if url.scheme not in ('http', 'https') or url.netloc != 't.me' or len(parts) != 2 or not parts[1].isdigit():
     raise ValueError("Invalid Telegram URL format. Expected: https://t.me/channelname/123")
-channel_username, message_id = match.groups()
-message_id = int(message_id)
+channel_username, message_id = parts[0], int(parts[1])
 
 async def main():
     print(f"Attempting to download message {message_id} from {channel_username}")
@@ -33,15 +33,17 @@ async def main():
     # Initialize client
     async with TelegramClient('debug_session', api_id, api_hash) as client:
         try:
-            # Get the channel
-            channel = await client.get_entity(channel_username)
+            # Get the channel and the message concurrently; get_messages
+            # resolves the username itself, so neither waits on the other
+            channel, message = await asyncio.gather(
+                client.get_entity(channel_username),
+                client.get_messages(channel_username, ids=message_id)
+            )
             print(f"\nChannel info:")
             print(f"ID: {channel.id}")
             print(f"Title: {channel.title}")
             print(f"Username: {channel.username}")
             
-            # Get the message
-            message = await client.get_messages(channel, ids=message_id)
             if not message:
                 print(f"Message {message_id} not found!")
                 return
@@ -0,0 +1,76 @@
+"""
+Shared loading of Telegram download logs for the analysis scripts
+The parsed messages are cached in a Parquet file next to the JSON log,
+so repeat runs skip JSON parsing until the log changes.
+"""
+
+import pandas as pd
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_FILE = 'download_log.json'
+CACHE_FILE = 'download_log.parquet'
+
+def load_log_file():
+    """Load the download log JSON file"""
+    if not os.path.exists(LOG_FILE):
+        raise FileNotFoundError(f"Could not find {LOG_FILE}")
+
+    if orjson is not None:
+        with open(LOG_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+
+    with open(LOG_FILE, 'r') as f:
+        return json.load(f)
+
+def build_messages_df(log_data):
+    """Build a DataFrame with one row per logged message"""
+    # Build each column in one pass over the messages
+    msgs = list(log_data['messages'].values())
+    keys = dict.fromkeys(k for m in msgs for k in m)
+    cols = {k: [m.get(k) for m in msgs] for k in keys}
+
+    # Add total reactions while the reaction lists are still plain Python objects
+    cols['total_reactions'] = [sum(r['count'] for r in rs) for rs in cols['reactions']]
+
+    df = pd.DataFrame(cols)
+
+    # Every analysis groups by user; categorical codes make those groupbys
+    # cheap, and the Parquet cache keeps the column dictionary-encoded
+    df['reply_name'] = df['reply_name'].astype('category')
+    return df
+
+def load_messages_df():
+    """Load the messages DataFrame, from the Parquet cache if it is up to date"""
+    if not os.path.exists(LOG_FILE):
+        raise FileNotFoundError(f"Could not find {LOG_FILE}")
+
+    loads = orjson.loads if orjson is not None else json.loads
+
+    # The cache carries the mtime of the log it was built from, so a log replaced
+    # while it was being parsed (or within the same mtime tick) still counts as new
+    log_mtime = os.stat(LOG_FILE).st_mtime_ns
+    if os.path.exists(CACHE_FILE) and os.stat(CACHE_FILE).st_mtime_ns == log_mtime:
+        try:
+            df = pd.read_parquet(CACHE_FILE)
+            # Reactions are stored as JSON strings, Parquet has no good fit for lists of dicts
+            df['reactions'] = [loads(r) for r in df['reactions']]
+            return df
+        except (ImportError, ValueError, OSError) as e:
+            print(f"Ignoring unreadable cache {CACHE_FILE}: {e}")
+
+    df = build_messages_df(load_log_file())
+
+    try:
+        cache = df.assign(reactions=[json.dumps(r, ensure_ascii=False) for r in df['reactions']])
+        cache.to_parquet(CACHE_FILE, compression='zstd', index=False)
+        os.utime(CACHE_FILE, ns=(log_mtime, log_mtime))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"Could not write cache {CACHE_FILE}: {e}")
+
+    return df
@@ -8,7 +8,7 @@ It can download:
 - Both of the above
 
 Requirements:
-- Python 3.6+
+- Python 3.9+
 - Telegram API credentials (API_ID and API_HASH) in .env file
 - Channel username in .env file
 
@@ -25,6 +25,7 @@ First Time Setup:
    API_HASH=your_api_hash
    CHANNEL_USERNAME=target_channel_username
    TOPIC_ID=0  # Default to 0 for main channel
+   DUCK_DEBUG=1  # Optional: same as --verbose
    
    Note: CHANNEL_USERNAME should be without the @ symbol
 
@@ -36,14 +37,19 @@ Options:
     --skip-my-reactions      Skip downloading media you reacted to
     --force-redownload       Force redownload of all files, even if they exist
                             (by default, existing files are skipped)
-    --limit N               Limit downloads to N items (useful for testing)
+    --limit N               Limit downloads to N items, newest first (useful for testing)
     --clean                Delete all existing downloads and logs before starting
     --resume-from          Resume from message ID
     --max-retries          Maximum retry attempts for failed downloads
-    --checkpoint-interval  Save log every N successful downloads
+    --checkpoint-interval  Flush the download journal every N successful downloads
+    --max-concurrent-downloads  Maximum downloads in flight at once
+    --rate                 Maximum downloads started per second (0 for no limit)
+    --max-open-files       Maximum files open at once
     --verify-only          Only verify existing downloads
     --dry-run              Scan without downloading
     --output-dir           Custom download directory
+    --log-retention-days   Drop downloaded messages older than N days from the log
+    --verbose              Print per-message details, including skipped files
     --user-id              Filter for specific user ID
     --username             Filter for specific username
     --reacted-by           Get messages that the specified user reacted to
@@ -80,15 +86,26 @@ Output Structure:
 
 import json
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import time
 from dotenv import load_dotenv
 import argparse
 import traceback
 import asyncio
+import atexit
+import functools
+import hashlib
+import itertools
 import re
+import shutil
+from collections import deque
 from telethon import TelegramClient, events, errors
-from telethon.tl.types import MessageMediaPhoto
+from telethon.tl.types import InputMessagesFilterPhotos, MessageMediaPhoto, PhotoSizeProgressive
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Constants
 DOWNLOAD_DIRS = {
@@ -96,10 +113,27 @@ DOWNLOAD_DIRS = {
 }
 
 LOG_FILE = 'download_log.json'
-CHECKPOINT_INTERVAL = 10  # Save log every 10 successful downloads
+JOURNAL_FILE = 'download_log.jsonl'  # Downloads since the last full save of LOG_FILE
+OLD_JOURNAL_FILE = f'{JOURNAL_FILE}.old'  # Journal set aside while a full save is written
 BATCH_SIZE = 100  # Number of messages to fetch at once
-MAX_CONCURRENT_DOWNLOADS = 5  # Balance between speed and rate limits
-DEFAULT_CHECKPOINT_INTERVAL = 10
+REPLY_FETCHES_IN_FLIGHT = 4  # Reply batches fetched in the background during a scan
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = 5  # Balance between speed and rate limits
+DEFAULT_DOWNLOAD_RATE = 20  # Download starts per second; Telegram limits request rate, not concurrency
+DOWNLOAD_REQUEST_SIZE = 512 * 1024  # Bytes per file request; Telegram's maximum
+DOWNLOAD_PARTS = 4  # Requests of one large file kept in flight at once
+DOWNLOAD_QUEUE_SIZE = 2 * BATCH_SIZE  # Qualified messages buffered between scan and downloads
+DOWNLOAD_WORKERS = 2  # One batch can download while the next is being collected
+DEFAULT_CHECKPOINT_INTERVAL = 10  # Flush the download journal every 10 downloads
+PROGRESS_INTERVAL = 0.2  # Minimum seconds between progress line redraws
+
+def default_max_open_files():
+    """A quarter of the process's file descriptor limit, capped at 500"""
+    try:
+        limit = os.sysconf('SC_OPEN_MAX')
+    except (AttributeError, ValueError, OSError):
+        # No sysconf on Windows
+        return 500
+    return max(1, min(limit // 4, 500)) if limit > 0 else 500
 
 # Argument parser
 parser = argparse.ArgumentParser(description='Download media from Telegram channel based on reactions')
@@ -110,18 +144,21 @@ parser.add_argument('--skip-my-reactions', action='store_true',
 parser.add_argument('--force-redownload', action='store_true',
                    help='Force redownload of all files, even if they exist')
 parser.add_argument('--limit', type=int, 
-                   help='Limit the number of downloads (useful for testing)')
+                   help='Limit the number of downloads, taking the newest messages first (useful for testing)')
 parser.add_argument('--clean', action='store_true',
                    help='Delete all existing downloads and logs before starting')
 parser.add_argument('--resume-from', type=int, help='Resume from message ID')
 parser.add_argument('--max-retries', type=int, default=3, 
                    help='Maximum retry attempts for failed downloads')
 parser.add_argument('--checkpoint-interval', type=int, 
-                   help=f'Save log every N successful downloads (default: {DEFAULT_CHECKPOINT_INTERVAL})')
+                   help=f'Flush the download journal every N successful downloads (default: {DEFAULT_CHECKPOINT_INTERVAL})')
 parser.add_argument('--verify-only', action='store_true',
                    help='Only verify existing downloads')
 parser.add_argument('--dry-run', action='store_true',
                    help='Scan without downloading')
+parser.add_argument('--log-retention-days', type=int,
+                   help='Drop downloaded messages older than N days from the log '
+                        '(they no longer appear in the analysis scripts or user filters)')
 parser.add_argument('--output-dir', type=str,
                    help='Custom download directory')
 parser.add_argument('--user-id', type=int,
@@ -132,8 +169,22 @@ parser.add_argument('--reacted-by', action='store_true',
                    help='Get messages that the specified user reacted to')
 parser.add_argument('--replied-to', action='store_true',
                    help='Get messages that are replies to the specified user')
+parser.add_argument('--max-concurrent-downloads', type=int,
+                   help=f'Maximum downloads in flight at once (default: {DEFAULT_MAX_CONCURRENT_DOWNLOADS})')
+parser.add_argument('--rate', type=float,
+                   help=f'Maximum downloads started per second, 0 for no limit (default: {DEFAULT_DOWNLOAD_RATE})')
+parser.add_argument('--max-open-files', type=int,
+                   help='Maximum files open at once for downloads and copies '
+                        '(default: a quarter of the file descriptor limit, at most 500)')
+parser.add_argument('--verbose', action='store_true',
+                   help='Print per-message details, including skipped and linked files')
 args = parser.parse_args()
 
+CHECKPOINT_INTERVAL = args.checkpoint_interval or DEFAULT_CHECKPOINT_INTERVAL
+MAX_OPEN_FILES = args.max_open_files or default_max_open_files()
+MAX_CONCURRENT_DOWNLOADS = args.max_concurrent_downloads or DEFAULT_MAX_CONCURRENT_DOWNLOADS
+DOWNLOAD_RATE = DEFAULT_DOWNLOAD_RATE if args.rate is None else args.rate
+
 # Load environment variables
 load_dotenv()
 
@@ -143,6 +194,10 @@ api_hash = os.getenv('API_HASH')
 channel_username = os.getenv('CHANNEL_USERNAME')
 topic_id = int(os.getenv('TOPIC_ID', 0))  # Default to 0 for main channel
 
+# Per-message details (reactions, reply text, file sizes, skipped files) are
+# only printed with --verbose or DUCK_DEBUG=1
+DEBUG = args.verbose or os.getenv('DUCK_DEBUG') == '1'
+
 # Validate environment variables
 if not all([api_id, api_hash, channel_username]):
     raise ValueError("Please ensure all required environment variables are set in .env file")
@@ -158,11 +213,14 @@ def clean_workspace():
     if os.path.exists(f"{LOG_FILE}.bak"):
         os.remove(f"{LOG_FILE}.bak")
         print(f"Deleted {LOG_FILE}.bak")
+    for journal in (OLD_JOURNAL_FILE, JOURNAL_FILE):
+        if os.path.exists(journal):
+            os.remove(journal)
+            print(f"Deleted {journal}")
     
     # Clean download directories
     for dir_name, dir_path in DOWNLOAD_DIRS.items():
         if os.path.exists(dir_path):
-            import shutil
             shutil.rmtree(dir_path)
             print(f"Cleaned {dir_path}")
         # Always create the directory
@@ -175,8 +233,7 @@ if args.clean:
 else:
     # Create download directories if they don't exist
     for directory in DOWNLOAD_DIRS.values():
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+        os.makedirs(directory, exist_ok=True)
 
 # Initialize the client
 client = TelegramClient('session_name', api_id, api_hash)
@@ -185,48 +242,157 @@ def load_log_file():
     """Load existing log file if it exists"""
     if os.path.exists(LOG_FILE):
         try:
-            with open(LOG_FILE, 'r') as f:
-                data = json.load(f)
-                if isinstance(data, dict) and 'messages' in data:
-                    return data
-        except (json.JSONDecodeError, KeyError):
+            if orjson is not None:
+                with open(LOG_FILE, 'rb') as f:
+                    data = orjson.loads(f.read())
+            else:
+                with open(LOG_FILE, 'r') as f:
+                    data = json.load(f)
+            if isinstance(data, dict) and 'messages' in data:
+                # Key messages by int id in memory; JSON keys are strings only on disk
+                data['messages'] = {int(k): v for k, v in data['messages'].items()}
+                replay_journal(data)
+                return data
+        except (json.JSONDecodeError, KeyError, ValueError):
             print("Invalid log file found, starting fresh")
     
-    return {
+    data = {
         'last_scan_time': None,
         'messages': {},
-        'last_successful_id': None  # Track last successfully downloaded message
+        'last_successful_id': None,  # Track last successfully downloaded message
+        'last_scanned_id': None  # Resume cursor: every message up to here was scanned
     }
+    replay_journal(data)
+    return data
+
+def serialize_log(log_data):
+    """Serialize log data to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(log_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(log_data, indent=2).encode('utf-8')
+
+def write_log_file(payload):
+    """Replace the log file with already-serialized log data, unless it is unchanged"""
+    # Skip the backup and write when this is what the last save wrote
+    digest = hashlib.blake2b(payload, digest_size=16).digest()
+    if digest == write_log_file.last_digest:
+        return
+    
+    # Only create backup on first save. A hardlink rather than a copy of the whole
+    # log, and the live log stays in place until the new one replaces it; the
+    # replace below gives LOG_FILE a new file, so the backup keeps the old contents.
+    if not write_log_file.has_backup:
+        if os.path.exists(LOG_FILE):
+            link_or_copy(LOG_FILE, f"{LOG_FILE}.bak")
+        write_log_file.has_backup = True
+    
+    # Write to a temporary file and swap it in, so an interrupted save
+    # never leaves a truncated log behind
+    tmp_file = f"{LOG_FILE}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_file, LOG_FILE)
+    write_log_file.last_digest = digest
+
+write_log_file.last_digest = None
+write_log_file.has_backup = False
+
+def rotate_journal():
+    """Set the journal aside before a full save; later downloads start a new one"""
+    close_journal()
+    if not os.path.exists(JOURNAL_FILE):
+        return
+    if os.path.exists(OLD_JOURNAL_FILE):
+        # Left by a save that was interrupted; its downloads are not in the log file yet
+        with open(JOURNAL_FILE, 'rb') as src, open(OLD_JOURNAL_FILE, 'ab') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(JOURNAL_FILE)
+    else:
+        os.replace(JOURNAL_FILE, OLD_JOURNAL_FILE)
+
+def discard_old_journal():
+    """Delete the set-aside journal once the full save covering it is written"""
+    if os.path.exists(OLD_JOURNAL_FILE):
+        os.remove(OLD_JOURNAL_FILE)
 
 def save_checkpoint(log_data, force=False, is_final=False):
-    """Save log data based on checkpoint conditions"""
-    # Get the count of downloaded files
-    downloaded_count = sum(1 for msg in log_data['messages'].values() 
-                         if msg.get('downloaded', False))
-    
-    # Save if:
-    # 1. This is a forced save, or
-    # 2. This is the final save, or
-    # 3. We've hit our checkpoint interval
-    if force or is_final or (downloaded_count % CHECKPOINT_INTERVAL == 0):
-        # Only create backup on first save
-        if not hasattr(save_checkpoint, 'has_backup'):
-            if os.path.exists(LOG_FILE):
-                import shutil
-                backup_name = f"{LOG_FILE}.bak"
-                shutil.copy2(LOG_FILE, backup_name)
-            save_checkpoint.has_backup = True
-        
-        # Save current state
-        with open(LOG_FILE, 'w') as f:
-            json.dump(log_data, f, indent=2)
-        
-        if is_final:
-            print("Final log save completed")
-        elif force:
-            print("Forced log checkpoint saved")
-        else:
-            print(f"Checkpoint saved at {downloaded_count} downloads")
+    """Write the full log; the journal it supersedes is discarded"""
+    rotate_journal()
+    write_log_file(serialize_log(log_data))
+    discard_old_journal()
+    
+    if is_final:
+        print("Final log save completed")
+    elif force:
+        print("Forced log checkpoint saved")
+
+async def save_checkpoint_async(log_data):
+    """Write the full log while downloads are running, without blocking the event loop"""
+    # The rotation and the snapshot happen together on the loop, so every download
+    # is either in the snapshot or journaled afresh after it
+    rotate_journal()
+    payload = serialize_log(log_data)
+    await asyncio.to_thread(write_log_file, payload)
+    discard_old_journal()
+    print("Forced log checkpoint saved")
+
+def journal_download(msg_info):
+    """Append a downloaded message's log entry to the journal"""
+    # One short line per download instead of rewriting the whole log; the line is
+    # buffered and reaches the OS every CHECKPOINT_INTERVAL downloads and at exit
+    if journal_download.file is None:
+        journal_download.file = open(JOURNAL_FILE, 'ab')
+    if orjson is not None:
+        line = orjson.dumps(msg_info)
+    else:
+        line = json.dumps(msg_info).encode('utf-8')
+    journal_download.file.write(line + b'\n')
+    
+    journal_download.pending += 1
+    if journal_download.pending >= CHECKPOINT_INTERVAL:
+        journal_download.file.flush()
+        journal_download.pending = 0
+
+journal_download.file = None
+journal_download.pending = 0
+
+def replay_journal(log_data):
+    """Apply downloads journaled since the last full save to loaded log data"""
+    loads = orjson.loads if orjson is not None else json.loads
+    # A journal set aside by an interrupted save holds the older downloads
+    for journal in (OLD_JOURNAL_FILE, JOURNAL_FILE):
+        if not os.path.exists(journal):
+            continue
+        replayed = 0
+        with open(journal, 'r+b') as f:
+            end = 0
+            for line in f:
+                try:
+                    msg_info = loads(line) if line.endswith(b'\n') else None
+                except ValueError:
+                    msg_info = None
+                if msg_info is None:
+                    # A line cut short by an interrupted run; everything before it is
+                    # intact. Cut it off so lines appended later stay readable.
+                    f.truncate(end)
+                    break
+                end += len(line)
+                log_data['messages'][msg_info['id']] = msg_info
+                mark_downloaded(log_data, msg_info)
+                replayed += 1
+        print(f"Replayed {replayed} downloads from {journal}")
+
+@atexit.register
+def close_journal():
+    """Flush and close the journal, so downloads survive an interrupted run"""
+    if journal_download.file is not None:
+        journal_download.file.close()
+        journal_download.file = None
+        journal_download.pending = 0
+
+# Filename sanitizing: drop characters invalid on common filesystems, turn separators into underscores
+SANITIZE_TABLE = str.maketrans({**dict.fromkeys('<>:"/\\|?*'), ' ': '_', ',': '_'})
+MULTI_UNDERSCORE = re.compile(r'_+')
 
 def sanitize_filename(text, max_length=50):
     """
@@ -239,195 +405,294 @@ def sanitize_filename(text, max_length=50):
     """
     if text is None:
         return 'unnamed'
-        
+    return sanitize_text(str(text), max_length)
+
+# Names and common reply texts repeat across messages, so results are cached
+@functools.lru_cache(maxsize=4096)
+def sanitize_text(text, max_length):
+    """Sanitize a non-None string; see sanitize_filename"""
     # Remove newlines and collapse multiple spaces
-    text = ' '.join(str(text).split())
-    # Remove invalid characters
-    text = re.sub(r'[<>:"/\\|?*]', '', text)
-    # Replace spaces and other characters
-    text = re.sub(r'[\s,]', '_', text)
+    text = ' '.join(text.split())
+    # Remove invalid characters and replace spaces and commas in one pass
+    text = text.translate(SANITIZE_TABLE)
     # Remove any resulting double underscores
-    text = re.sub(r'_+', '_', text)
+    text = MULTI_UNDERSCORE.sub('_', text)
     # Truncate to max_length
     return text[:max_length] if text else 'untitled'
 
+# Sanitized reply names by sender id; the same few senders recur throughout a scan
+sender_filenames = {}
+
 def debug_print_message(message):
-    """Print all available attributes of a message object"""
+    """Print the fields of a message object"""
     print("\nFull Message Debug Info:")
     print("=" * 50)
-    for attr in dir(message):
+    # Instance fields only; dir() would also walk every inherited method and property
+    for attr, value in vars(message).items():
         if not attr.startswith('_'):  # Skip private attributes
-            try:
-                value = getattr(message, attr)
-                if not callable(value):  # Skip methods
-                    print(f"{attr}: {value}")
-            except Exception as e:
-                print(f"{attr}: Error accessing - {e}")
+            print(f"{attr}: {value}")
     print("=" * 50)
 
-async def get_qualified_messages(channel):
-    """Get messages that qualify for download based on reactions and user filters"""
-    log_data = load_log_file()
+async def get_reply_messages(channel, messages):
+    """Fetch the messages replied to by `messages`, BATCH_SIZE ids per request"""
+    reply_ids = list({
+        message.reply_to.reply_to_msg_id
+        for message in messages
+        if message.reply_to and getattr(message.reply_to, 'reply_to_msg_id', None)
+    })
+    replies = {}
+    for i in range(0, len(reply_ids), BATCH_SIZE):
+        batch = await get_messages_batch(client, channel, reply_ids[i:i + BATCH_SIZE])
+        replies.update((reply.id, reply) for reply in batch if reply)
+    return replies
+
+def build_message_info(message, reply):
+    """Build the log entry for a photo message from it and the message it replies to"""
+    # Get reply information
+    reply_text = None
+    reply_user_id = None
+    reply_username = None
+    reply_name = None
+    
+    if reply:
+        reply_text = reply.text
+        if reply.sender:
+            reply_user_id = reply.sender.id
+            reply_username = getattr(reply.sender, 'username', None)
+            # Get the most readable name available, handling None values
+            first_name = getattr(reply.sender, 'first_name', '') or ''
+            last_name = getattr(reply.sender, 'last_name', '') or ''
+            reply_name = (
+                f"{first_name} {last_name}"
+            ).strip() or reply_username or str(reply_user_id)
+    
+    # Ensure we have valid text
+    if not reply_text:
+        reply_text = "no_reply_text"
+    
+    # Format date without '20' prefix in year and only to minute precision
+    # (same as strftime("%y%m%d_%H%M"), without strftime's per-call overhead)
+    d = message.date
+    msg_time = f"{d.year % 100:02d}{d.month:02d}{d.day:02d}_{d.hour:02d}{d.minute:02d}"
+    
+    # Get reaction details and total
+    results = getattr(message.reactions, 'results', None) or ()
+    reaction_details = [{'emoji': r.reaction.emoticon, 'count': r.count} for r in results]
+    total_reactions = sum(r['count'] for r in reaction_details)
+    
+    # Sender names are sanitized once per sender
+    name_part = sender_filenames.get(reply_user_id)
+    if name_part is None:
+        name_part = sanitize_filename(reply_name or 'unnamed')
+        if reply_user_id is not None:
+            sender_filenames[reply_user_id] = name_part
+    
+    # Create base filename with proper text
+    base_filename = (
+        f"{msg_time}_"
+        f"{name_part}_"
+        f"r{total_reactions}_"
+        f"{sanitize_filename(reply_text)}"
+    )
+    
+    # Create message info
+    return {
+        'id': message.id,
+        'timestamp': msg_time,
+        'date_iso': message.date.isoformat(),
+        'url': f"https://t.me/{channel_username}/{message.id}",
+        'reply_text': reply_text,
+        'reply_user_id': reply_user_id,
+        'reply_username': reply_username,
+        'reply_name': reply_name,
+        'has_reactions': bool(reaction_details),
+        'total_reactions': total_reactions,
+        'reactions': reaction_details,
+        'base_filename': base_filename,
+        'downloaded': False
+    }
+
+async def get_qualified_messages(channel, log_data, target_user=None, queue=None):
+    """
+    Get messages that qualify for download based on reactions and user filters.
+    With a queue, each qualifying message is also put on it as soon as it is found,
+    as (msg_info, message or None, in all_reactions, is user interaction)
+    """
     qualified = {
         'all_reactions': [],
         'user_interactions': []
     }
     
-    # Get target user info if specified
-    target_user = None
-    if args.user_id or args.username:
-        try:
-            target_user = await client.get_entity(
-                args.user_id if args.user_id else args.username
-            )
-            print(f"Filtering for user: {target_user.first_name} {target_user.last_name} (@{target_user.username})")
-        except Exception as e:
-            print(f"Warning: Could not find specified user: {e}")
-            return qualified, log_data
-
-    # First, check what's already downloaded
-    latest_msg_id = 0
-    for msg_id, msg in log_data['messages'].items():
-        msg_id = int(msg_id)
-        latest_msg_id = max(latest_msg_id, msg_id)
+    async def add_qualified(msg_info, message, all_reactions, user_interaction):
+        """Record a qualifying message and hand it to the downloaders, if any"""
+        if all_reactions:
+            qualified['all_reactions'].append(msg_info)
+        if user_interaction:
+            qualified['user_interactions'].append(msg_info)
+        if queue is not None and (all_reactions or user_interaction):
+            await queue.put((msg_info, message, all_reactions, user_interaction))
+    
+    # Resume after the scan cursor; logs written before it existed fall back to their newest entry
+    if args.resume_from:
+        latest_msg_id = args.resume_from - 1
+    elif 'last_scanned_id' in log_data:
+        latest_msg_id = log_data['last_scanned_id'] or 0
+    else:
+        latest_msg_id = max(log_data['messages'], default=0)
+        # Record the fallback now: a --limit scan doesn't move the cursor, and the
+        # newer messages it logs must not become the next scan's starting point
+        log_data['last_scanned_id'] = latest_msg_id
+    
+    # First, check what's already downloaded; downloads update entries while we wait on the queue
+    for msg in list(log_data['messages'].values()):
+        # Add to appropriate categories based on existing data,
+        # skipping files already downloaded (unless force redownload)
+        in_all_reactions = (msg['has_reactions'] and not args.skip_all_reactions
+                            and (args.force_redownload or not msg.get('downloaded', False)))
         
-        # Skip if already downloaded (unless force redownload)
-        if msg.get('downloaded', False) and not args.force_redownload:
-            continue
-            
-        # Add to appropriate categories based on existing data
-        if msg['has_reactions'] and not args.skip_all_reactions:
-            qualified['all_reactions'].append(msg)
-            
+        is_user_interaction = False
         if target_user:
             if args.replied_to and msg['reply_user_id'] == target_user.id:
-                qualified['user_interactions'].append(msg)
+                is_user_interaction = True
             elif args.reacted_by:
                 # Check reactions from log data
                 for reaction in msg.get('reactions', []):
                     if any(reactor.id == target_user.id for reactor in getattr(reaction, 'recent_reactors', [])):
-                        qualified['user_interactions'].append(msg)
+                        is_user_interaction = True
                         break
+        
+        await add_qualified(msg, None, in_all_reactions, is_user_interaction)
 
     # Then only scan for messages newer than what we have
     print(f"\nScanning for new messages after ID {latest_msg_id}...")
     
+    # A --limit run is a quick test: scan newest-first, stopping after 10x the limit
+    # in case most messages don't qualify. That skips the older part of the range,
+    # so the resume cursor is only moved by full oldest-first scans.
+    track_cursor = not args.limit
+    if args.limit:
+        scan_order = {'limit': args.limit * 10}
+    else:
+        scan_order = {'reverse': True}
+    
+    # Rescans (--resume-from, --limit) pass over messages that are already downloaded;
+    # those need no reply lookup or download, and their log entries are left as they are.
+    # --reacted-by still rechecks them, as the log does not record who reacted.
+    if args.force_redownload or args.reacted_by:
+        downloaded_ids = set()
+    else:
+        downloaded_ids = {msg_id for msg_id, msg in log_data['messages'].items() if msg.get('downloaded')}
+    
+    # Qualifying photos wait here so their replies can be fetched in one request
+    pending = []
+    
+    # Reply fetches run in the background while the scan reads on; batches are
+    # still qualified in scan order. A --limit run resolves each batch before
+    # reading further so the limit check stays exact.
+    in_flight = deque()
+    max_in_flight = 1 if args.limit else REPLY_FETCHES_IN_FLIGHT
+    
+    def fetch_pending():
+        """Start fetching replies for the pending messages"""
+        messages = pending[:]
+        pending.clear()
+        in_flight.append((messages, asyncio.create_task(get_reply_messages(channel, messages))))
+    
+    async def process_oldest():
+        """Qualify the oldest in-flight batch once its replies arrive; True once the limit is hit"""
+        messages, replies = in_flight.popleft()
+        replies = await replies
+        
+        for message in messages:
+            reply_id = getattr(message.reply_to, 'reply_to_msg_id', None) if message.reply_to else None
+            msg_info = build_message_info(message, replies.get(reply_id))
+            reply_user_id = msg_info['reply_user_id']
+            reaction_details = msg_info['reactions']
+            
+            # Store in log by message ID
+            log_data['messages'][message.id] = msg_info
+            if track_cursor:
+                log_data['last_scanned_id'] = message.id
+            
+            # Check user-specific conditions
+            is_user_interaction = False
+            if target_user:
+                if args.replied_to and reply_user_id == target_user.id:
+                    is_user_interaction = True
+                elif args.reacted_by:
+                    # Reactors are listed once per message in recent_reactions, not per result
+                    recent = getattr(message.reactions, 'recent_reactions', None) or ()
+                    is_user_interaction = any(
+                        getattr(r.peer_id, 'user_id', None) == target_user.id for r in recent
+                    )
+
+            # Add to appropriate categories
+            await add_qualified(
+                msg_info, message,
+                msg_info['has_reactions'] and not args.skip_all_reactions,
+                is_user_interaction
+            )
+            
+            if msg_info['has_reactions']:
+                print(f"Found qualifying message ({len(qualified['all_reactions'])}): {message.id}")
+            if msg_info['has_reactions'] and DEBUG:
+                print(f"Has reactions: {msg_info['has_reactions']}")
+                print(f"Reply from: {msg_info['reply_username'] or msg_info['reply_user_id']}")
+                print(f"Reply text: {msg_info['reply_text'][:100]}...")
+                # New way to format reactions
+                reaction_strings = [f"{r['emoji']}({r['count']})" for r in reaction_details]
+                print(f"Reactions: {', '.join(reaction_strings)}")
+                print(f"URL: {msg_info['url']}")
+            
+            # Check download limit
+            if args.limit and (len(qualified['all_reactions']) + len(qualified['user_interactions'])) >= args.limit:
+                print(f"\nReached download limit of {args.limit} items")
+                return True
+        return False
+    
+    # Telegram caps each history request at 100 messages; without a limit Telethon also
+    # sleeps a second between requests, which wait_time=0 skips (flood waits still apply).
+    # The photo filter makes Telegram skip non-photo messages server-side; Telegram
+    # ignores it when reading a topic's replies, so the media check below stays.
     async for message in client.iter_messages(
         channel,
         min_id=latest_msg_id,
-        reverse=True,
-        reply_to=topic_id
+        reply_to=topic_id or None,
+        filter=InputMessagesFilterPhotos(),
+        wait_time=0,
+        **scan_order
     ):
-        if hasattr(message, 'reactions') and message.reactions and message.media:
+        if message.id in downloaded_ids:
+            pass
+        elif hasattr(message, 'reactions') and message.reactions and message.media:
             if isinstance(message.media, MessageMediaPhoto):
-                # Get reply information
-                reply_text = None
-                reply_user_id = None
-                reply_username = None
-                reply_name = None
-                
-                if message.reply_to:
-                    reply = await message.get_reply_message()
-                    if reply:
-                        reply_text = reply.text
-                        if reply.sender:
-                            reply_user_id = reply.sender.id
-                            reply_username = getattr(reply.sender, 'username', None)
-                            # Get the most readable name available, handling None values
-                            first_name = getattr(reply.sender, 'first_name', '') or ''
-                            last_name = getattr(reply.sender, 'last_name', '') or ''
-                            reply_name = (
-                                f"{first_name} {last_name}"
-                            ).strip() or reply_username or str(reply_user_id)
-                
-                # Ensure we have valid text
-                if not reply_text:
-                    reply_text = "no_reply_text"
-                
-                # Format date without '20' prefix in year and only to minute precision
-                msg_time = message.date.strftime("%y%m%d_%H%M")
-                
-                # Get reaction details and total
-                reaction_details = []
-                total_reactions = 0
-                if hasattr(message.reactions, 'results'):
-                    for reaction in message.reactions.results:
-                        reaction_details.append({
-                            'emoji': reaction.reaction.emoticon,
-                            'count': reaction.count
-                        })
-                        total_reactions += reaction.count
-                
-                # Create base filename with proper text
-                base_filename = (
-                    f"{msg_time}_"
-                    f"{sanitize_filename(reply_name or 'unnamed')}_"
-                    f"r{total_reactions}_"
-                    f"{sanitize_filename(reply_text)}"
-                )
-                
-                # Create message info
-                msg_info = {
-                    'id': message.id,
-                    'timestamp': msg_time,
-                    'date_iso': message.date.isoformat(),
-                    'url': f"https://t.me/{channel_username}/{message.id}",
-                    'reply_text': reply_text,
-                    'reply_user_id': reply_user_id,
-                    'reply_username': reply_username,
-                    'reply_name': reply_name,
-                    'has_reactions': bool(reaction_details),
-                    'total_reactions': total_reactions,
-                    'reactions': reaction_details,
-                    'base_filename': base_filename,
-                    'downloaded': False
-                }
-                
-                # Store in log by message ID
-                log_data['messages'][str(message.id)] = msg_info
-                
-                # Check user-specific conditions
-                is_user_interaction = False
-                if target_user:
-                    if args.replied_to and reply_user_id == target_user.id:
-                        is_user_interaction = True
-                    elif args.reacted_by:
-                        # Check if target user reacted using the reactions attribute
-                        try:
-                            if hasattr(message, 'reactions') and message.reactions:
-                                for reaction in message.reactions.results:
-                                    if hasattr(reaction, 'recent_reactors'):
-                                        for reactor in reaction.recent_reactors:
-                                            if reactor.id == target_user.id:
-                                                is_user_interaction = True
-                                                break
-                        except Exception as e:
-                            print(f"Error checking reactions: {e}")
-
-                # Add to appropriate categories
-                if msg_info['has_reactions'] and not args.skip_all_reactions:
-                    qualified['all_reactions'].append(msg_info)
-                if is_user_interaction:
-                    qualified['user_interactions'].append(msg_info)
-                
-                if msg_info['has_reactions']:
-                    print(f"\nFound qualifying message ({len(qualified['all_reactions'])}): {message.id}")
-                    print(f"Has reactions: {msg_info['has_reactions']}")
-                    print(f"Reply from: {msg_info['reply_username'] or msg_info['reply_user_id']}")
-                    print(f"Reply text: {msg_info['reply_text'][:100]}...")
-                    # New way to format reactions
-                    reaction_strings = [f"{r['emoji']}({r['count']})" for r in reaction_details]
-                    print(f"Reactions: {', '.join(reaction_strings)}")
-                    print(f"URL: {msg_info['url']}")
+                pending.append(message)
                 
-                # Check download limit
-                if args.limit and (len(qualified['all_reactions']) + len(qualified['user_interactions'])) >= args.limit:
-                    print(f"\nReached download limit of {args.limit} items")
-                    break
+                # Flush a full batch, or sooner when a --limit is close
+                batch_size = BATCH_SIZE
+                if args.limit:
+                    remaining = args.limit - len(qualified['all_reactions']) - len(qualified['user_interactions'])
+                    batch_size = min(batch_size, remaining)
+                if len(pending) >= batch_size:
+                    fetch_pending()
+                    if len(in_flight) >= max_in_flight and await process_oldest():
+                        break
+        
+        # With nothing pending, everything up to this message has been handled
+        if not pending and not in_flight and track_cursor:
+            log_data['last_scanned_id'] = message.id
+    else:
+        if pending or in_flight:
+            if pending:
+                fetch_pending()
+            while in_flight:
+                await process_oldest()
+            if track_cursor:
+                log_data['last_scanned_id'] = message.id
     
     # Update log file with new timestamp and messages
     log_data['last_scan_time'] = datetime.now(timezone.utc).isoformat()
-    save_checkpoint(log_data)
+    await save_checkpoint_async(log_data)
     
     print(f"\nScan complete!")
     print(f"Processed {len(qualified['all_reactions'])} messages")
@@ -435,7 +700,7 @@ async def get_qualified_messages(channel):
     print(f"- With any reactions: {len(qualified['all_reactions'])}")
     print(f"- With user interactions: {len(qualified['user_interactions'])}")
     
-    return qualified, log_data
+    return qualified
 
 # Add progress tracking class
 class ProgressTracker:
@@ -443,6 +708,7 @@ class ProgressTracker:
         self.total = total_items
         self.completed = 0
         self.start_time = time.time()
+        self.last_print = 0.0
         
     def update(self, items_completed=1):
         self.completed += items_completed
@@ -451,12 +717,25 @@ class ProgressTracker:
         remaining = (self.total - self.completed) / rate if rate > 0 else 0
         
         return {
-            'percent': (self.completed / self.total) * 100,
+            'percent': (self.completed / self.total) * 100 if self.total else 0.0,
             'elapsed': elapsed,
             'remaining': remaining,
             'rate': rate
         }
         
+    def report(self, items_completed=1):
+        """Update and redraw the progress line, at most once per PROGRESS_INTERVAL"""
+        stats = self.update(items_completed)
+        now = time.time()
+        if now - self.last_print < PROGRESS_INTERVAL and self.completed < self.total:
+            return stats
+        self.last_print = now
+        print(f"\rProgress: {stats['percent']:.1f}% | "
+              f"Elapsed: {self.format_time(stats['elapsed'])} | "
+              f"Remaining: {self.format_time(stats['remaining'])} | "
+              f"Rate: {stats['rate']:.1f} files/sec", end='')
+        return stats
+        
     def format_time(self, seconds):
         return time.strftime('%H:%M:%S', time.gmtime(seconds))
 
@@ -465,15 +744,121 @@ async def get_messages_batch(client, channel, message_ids):
     """Retrieve multiple messages at once"""
     return await client.get_messages(channel, ids=message_ids)
 
-# Add download semaphore for parallel downloads
-download_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+class AsyncTokenBucket:
+    """Rate limiter: acquire() waits until one of capacity tokens, refilled at rate per second, is free"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# Network transfers and open local files are limited separately; when both are
+# needed, network_semaphore is always taken first
+network_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+file_semaphore = asyncio.Semaphore(MAX_OPEN_FILES)
+
+# The semaphore caps transfers in flight, the bucket paces how fast new ones
+# start, so bursts stay under Telegram's flood limits instead of waiting them out
+download_bucket = AsyncTokenBucket(DOWNLOAD_RATE, MAX_CONCURRENT_DOWNLOADS) if DOWNLOAD_RATE > 0 else None
+
+def photo_byte_count(media):
+    """Size of the photo version iter_download fetches (the last listed), or None if unknown"""
+    sizes = getattr(getattr(media, 'photo', None), 'sizes', None)
+    if not sizes:
+        return None
+    if isinstance(sizes[-1], PhotoSizeProgressive):
+        return max(sizes[-1].sizes)
+    return getattr(sizes[-1], 'size', None)
+
+async def download_stripe(client, media, data, index, parts, file_size):
+    """Fetch every parts-th request of a file, starting at request index, into data; returns the end written"""
+    offset = index * DOWNLOAD_REQUEST_SIZE
+    stride = parts * DOWNLOAD_REQUEST_SIZE
+    end = 0
+    async for chunk in client.iter_download(
+        media,
+        offset=offset,
+        stride=stride,
+        limit=-(-(file_size - offset) // stride),
+        request_size=DOWNLOAD_REQUEST_SIZE,
+        file_size=file_size
+    ):
+        end = offset + len(chunk)
+        data[offset:end] = chunk
+        offset += stride
+    return end
+
+def write_file(path, data):
+    """Write data to path via a temporary file, so path only appears once complete"""
+    # Each write gets its own temporary name, so two writes can never share one
+    part_path = f"{path}.{next(write_file.serial)}.part"
+    try:
+        with open(part_path, 'wb') as f:
+            f.write(data)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+write_file.serial = itertools.count()
+
+async def download_to_file(client, media, path):
+    """Download media into memory in large requests, then write it to path off the event loop"""
+    if media is None:
+        return None
+    
+    # Files spanning several requests are fetched as interleaved stripes, so
+    # up to DOWNLOAD_PARTS requests are in flight instead of one at a time
+    file_size = photo_byte_count(media)
+    parts = min(DOWNLOAD_PARTS, -(-file_size // DOWNLOAD_REQUEST_SIZE)) if file_size else 1
+    
+    if parts > 1:
+        data = bytearray(file_size)
+        stripes = [
+            asyncio.create_task(download_stripe(client, media, data, index, parts, file_size))
+            for index in range(parts)
+        ]
+        try:
+            ends = await asyncio.gather(*stripes)
+        except BaseException:
+            # Stop the other stripes before the caller retries, so no requests
+            # keep running outside network_semaphore
+            for stripe in stripes:
+                stripe.cancel()
+            await asyncio.gather(*stripes, return_exceptions=True)
+            raise
+        # Trust what arrived over the advertised size
+        del data[max(ends):]
+    else:
+        data = bytearray()
+        async for chunk in client.iter_download(media, request_size=DOWNLOAD_REQUEST_SIZE):
+            data += chunk
+    
+    # Photos are at most a few MB; one write in a thread keeps disk latency
+    # from stalling the transfers still running on the loop
+    async with file_semaphore:
+        await asyncio.to_thread(write_file, path, data)
+    return path
 
 async def download_media_with_retry(client, message, path, max_retries=3):
     """Download media with retry logic"""
-    async with download_semaphore:
+    async with network_semaphore:
         for attempt in range(max_retries):
+            if download_bucket:
+                await download_bucket.acquire()
             try:
-                result = await client.download_media(message.media, file=path)
+                result = await download_to_file(client, message.media, path)
                 if result:
                     return result
             except errors.FloodWaitError as e:
@@ -491,7 +876,44 @@ async def download_media_with_retry(client, message, path, max_retries=3):
                 raise
         return None
 
-async def get_user_specific_dir(username, interaction_type):
+def prune_log(log_data, retention_days):
+    """Drop downloaded entries older than retention_days from the log; returns how many were dropped"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    old_ids = [
+        msg_id for msg_id, msg in log_data['messages'].items()
+        if msg.get('downloaded') and datetime.fromisoformat(msg['date_iso']) < cutoff
+    ]
+    for msg_id in old_ids:
+        del log_data['messages'][msg_id]
+    return len(old_ids)
+
+def mark_downloaded(log_data, msg_info):
+    """Record that a message's file is in all_reactions"""
+    msg_info['downloaded'] = True
+    log_data['last_successful_id'] = max(msg_info['id'], log_data.get('last_successful_id') or 0)
+
+def link_or_copy(src_path, dst_path):
+    """Hardlink src_path to dst_path, copying when the filesystem can't link"""
+    if os.path.exists(dst_path):
+        if os.path.samefile(src_path, dst_path):
+            return
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        # Cross-device targets, filesystems without hardlinks, restricted Windows accounts
+        shutil.copy2(src_path, dst_path)
+
+def list_files(directory):
+    """Names of the files in directory, or an empty set if it doesn't exist"""
+    try:
+        # scandir reports file types from the directory listing itself, without a stat() per entry
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return set()
+
+def get_user_specific_dir(username, interaction_type):
     """Get or create user-specific download directory"""
     dir_name = f'downloads/{username}_{interaction_type}'
     os.makedirs(dir_name, exist_ok=True)
@@ -507,11 +929,29 @@ async def download_reacted_media():
     # Connect to the channel
     channel = await client.get_entity(channel_username)
     
+    # Get target user info if specified; the scan and the download pass share it
+    target_user = None
+    if args.user_id or args.username:
+        try:
+            target_user = await client.get_entity(
+                args.user_id if args.user_id else args.username
+            )
+            print(f"Filtering for user: {target_user.first_name} {target_user.last_name} (@{target_user.username})")
+        except Exception as e:
+            print(f"Warning: Could not find specified user: {e}")
+            return {}, [], []
+    
     # Get pre-scan of new messages
     if args.resume_from:
         print(f"Resuming from message ID: {args.resume_from}")
     
-    qualified_messages, log_data = await get_qualified_messages(channel)
+    log_data = load_log_file()
+    if args.log_retention_days is not None:
+        pruned = prune_log(log_data, args.log_retention_days)
+        print(f"Pruned {pruned} downloaded messages older than {args.log_retention_days} days from the log")
+    
+    if args.dry_run or args.verify_only:
+        qualified_messages = await get_qualified_messages(channel, log_data, target_user)
     
     if args.dry_run:
         print("\nDRY RUN - No downloads will be performed")
@@ -524,9 +964,8 @@ async def download_reacted_media():
         # Implement verification of existing files
         return await verify_downloads(qualified_messages)
     
-    # Initialize progress tracker
-    total_downloads = len(qualified_messages['all_reactions'])
-    progress = ProgressTracker(total_downloads)
+    # Initialize progress tracker; the total grows as the scan hands over downloads
+    progress = ProgressTracker(0)
     
     # Initialize tracking variables
     media_data = {
@@ -536,108 +975,125 @@ async def download_reacted_media():
     successful_downloads = []
     failed_downloads = []
     attempted_downloads = []
-    processed_messages = 0
 
     # Set up user-specific directory if needed
     user_dir = None
-    if args.user_id or args.username:
-        target_user = await client.get_entity(
-            args.user_id if args.user_id else args.username
-        )
+    if target_user:
         interaction_type = 'reacted' if args.reacted_by else 'results'
-        user_dir = await get_user_specific_dir(
+        user_dir = get_user_specific_dir(
             target_user.username or str(target_user.id), 
             interaction_type
         )
         DOWNLOAD_DIRS['user_specific'] = user_dir
 
-    # Process in batches
-    for i in range(0, len(qualified_messages['all_reactions']), BATCH_SIZE):
-        batch = qualified_messages['all_reactions'][i:i + BATCH_SIZE]
-        
-        # Get messages in batch
-        message_ids = [msg['id'] for msg in batch]
-        messages = await get_messages_batch(client, channel, message_ids)
-        
-        # Process batch
-        for msg_info, message in zip(batch, messages):
-            processed_messages += 1
-            try:
-                # Define path first
-                path = f'{DOWNLOAD_DIRS["all_reactions"]}/{msg_info["base_filename"]}.jpg'
-                
-                # Skip if exists
-                if os.path.exists(path) and not args.force_redownload:
+    # List the output directories once; existence checks become set lookups instead of a stat() per message
+    all_dir = DOWNLOAD_DIRS['all_reactions']
+    existing_all = list_files(all_dir)
+    existing_user = list_files(user_dir) if user_dir else set()
+
+    # Paths being written right now, each with an event set when done. Distinct
+    # messages can share a filename; the second waits for the first and then
+    # finds the file in place instead of writing it concurrently.
+    writing = {}
+
+    async def wait_for_writer(path):
+        """Wait until no other item is writing path"""
+        while path in writing:
+            await writing[path].wait()
+
+    async def download_all_reactions_item(msg_info, message):
+        """Download one message into all_reactions and record the outcome"""
+        try:
+            # Define path first
+            filename = f'{msg_info["base_filename"]}.jpg'
+            path = f'{all_dir}/{filename}'
+            
+            # Skip if exists
+            await wait_for_writer(path)
+            if filename in existing_all and not args.force_redownload:
+                if DEBUG:
                     print(f"Skipping existing file: {path}")
-                    media_data['all_reactions'].append(msg_info)
-                    successful_downloads.append(msg_info)
-                    continue
-                    
-                # Download with retry logic
+                progress.update()
+                mark_downloaded(log_data, msg_info)
+                media_data['all_reactions'].append(msg_info)
+                successful_downloads.append(msg_info)
+                return
+                
+            # Download with retry logic
+            writing[path] = asyncio.Event()
+            try:
                 result = await download_media_with_retry(
                     client, 
                     message, 
                     path, 
                     max_retries=args.max_retries
                 )
-                
-                if not result:
-                    raise Exception("Download failed - no media returned")
-                
-                print(f"Downloaded ({processed_messages}/{len(qualified_messages['all_reactions'])}): {path}")
-                file_size = os.path.getsize(path)
+                if result:
+                    existing_all.add(filename)
+            finally:
+                writing.pop(path).set()
+            
+            if not result:
+                raise Exception("Download failed - no media returned")
+            
+            file_size = await asyncio.to_thread(os.path.getsize, path)
+            if DEBUG:
                 print(f"File size: {file_size} bytes")
-                
-                # Track the attempt and ensure message info is in log_data
-                log_data['messages'][str(msg_info['id'])] = msg_info
-                attempted_downloads.append({
-                    **msg_info,
-                    'path': path,
-                    'expected_size': file_size
-                })
-                
-                # Update progress
-                stats = progress.update()
-                print(f"\rProgress: {stats['percent']:.1f}% | "
-                      f"Elapsed: {progress.format_time(stats['elapsed'])} | "
-                      f"Remaining: {progress.format_time(stats['remaining'])} | "
-                      f"Rate: {stats['rate']:.1f} files/sec", end='')
-                
-                # Add to tracking on successful download
-                media_data['all_reactions'].append(msg_info)
-                successful_downloads.append(msg_info)
-                
-            except Exception as e:
-                failed_downloads.append({
-                    **msg_info,
-                    'error': str(e)
-                })
-                print(f"Error during download of message {msg_info['id']}: {str(e)}")
-                continue
+            
+            # Track the attempt and ensure message info is in log_data
+            log_data['messages'][msg_info['id']] = msg_info
+            mark_downloaded(log_data, msg_info)
+            journal_download(msg_info)
+            attempted_downloads.append({
+                **msg_info,
+                'path': path,
+                'expected_size': file_size
+            })
+            
+            # Update progress
+            progress.report()
+            print(f"Downloaded ({progress.completed}/{progress.total}): {path}")
+            
+            # Add to tracking on successful download
+            media_data['all_reactions'].append(msg_info)
+            successful_downloads.append(msg_info)
+            
+        except Exception as e:
+            failed_downloads.append({
+                **msg_info,
+                'error': str(e)
+            })
+            print(f"Error during download of message {msg_info['id']}: {str(e)}")
 
-    print("\nDownloads complete!")
-    
-    # Save final state
-    save_checkpoint(log_data, is_final=True)
-    
-    # Process user interactions if specified
-    if user_dir:
-        for msg_info in qualified_messages['user_interactions']:
+    async def download_user_interaction_item(msg_info, message):
+        """Copy or download one user-interaction message into user_dir"""
+        try:
+            # First check if file exists in all_reactions
+            base_path = f"{msg_info['base_filename']}.jpg"
+            src_path = f"{all_dir}/{base_path}"
+            dst_path = f"{user_dir}/{base_path}"
+
+            # Skip if already in the user directory
+            await wait_for_writer(dst_path)
+            if base_path in existing_user and not args.force_redownload:
+                progress.update()
+                if DEBUG:
+                    print(f"Skipping existing file: {dst_path}")
+                return
+
+            writing[dst_path] = asyncio.Event()
             try:
-                # First check if file exists in all_reactions
-                base_path = f"{msg_info['base_filename']}.jpg"
-                src_path = f"{DOWNLOAD_DIRS['all_reactions']}/{base_path}"
-                dst_path = f"{user_dir}/{base_path}"
-
-                if os.path.exists(src_path):
-                    # Copy from all_reactions if it exists
-                    import shutil
-                    shutil.copy2(src_path, dst_path)
-                    print(f"Copied from all_reactions: {dst_path}")
-                    continue
+                if base_path in existing_all:
+                    # Link to the all_reactions file if it exists, in a thread so downloads keep running
+                    async with file_semaphore:
+                        await asyncio.to_thread(link_or_copy, src_path, dst_path)
+                    existing_user.add(base_path)
+                    progress.update()
+                    if DEBUG:
+                        print(f"Copied from all_reactions: {dst_path}")
+                    return
 
                 # If not in all_reactions, download directly
-                message = await client.get_messages(channel, ids=msg_info['id'])
                 if not message:
                     raise Exception("Could not retrieve message")
 
@@ -647,40 +1103,121 @@ async def download_reacted_media():
                     dst_path,
                     max_retries=args.max_retries
                 )
+                if result:
+                    existing_user.add(base_path)
+            finally:
+                writing.pop(dst_path).set()
 
-                if not result:
-                    raise Exception("Download failed - no media returned")
-                
-                print(f"Downloaded ({processed_messages}/{len(qualified_messages['user_interactions'])}): {dst_path}")
-                file_size = os.path.getsize(dst_path)
+            if not result:
+                raise Exception("Download failed - no media returned")
+            
+            file_size = await asyncio.to_thread(os.path.getsize, dst_path)
+            if DEBUG:
                 print(f"File size: {file_size} bytes")
-                
-                # Track the attempt and ensure message info is in log_data
-                log_data['messages'][str(msg_info['id'])] = msg_info
-                attempted_downloads.append({
-                    **msg_info,
-                    'path': dst_path,
-                    'expected_size': file_size
-                })
-                
-                # Update progress
-                stats = progress.update()
-                print(f"\rProgress: {stats['percent']:.1f}% | "
-                      f"Elapsed: {progress.format_time(stats['elapsed'])} | "
-                      f"Remaining: {progress.format_time(stats['remaining'])} | "
-                      f"Rate: {stats['rate']:.1f} files/sec", end='')
-                
-                # Add to tracking on successful download
-                media_data['user_interactions'].append(msg_info)
-                successful_downloads.append(msg_info)
-                
-            except Exception as e:
-                failed_downloads.append({
-                    **msg_info,
-                    'error': str(e)
-                })
-                print(f"Error during download of message {msg_info['id']}: {str(e)}")
-                continue
+            
+            # Track the attempt and ensure message info is in log_data
+            log_data['messages'][msg_info['id']] = msg_info
+            attempted_downloads.append({
+                **msg_info,
+                'path': dst_path,
+                'expected_size': file_size
+            })
+            
+            # Update progress
+            progress.report()
+            print(f"Downloaded ({progress.completed}/{progress.total}): {dst_path}")
+            
+            # Add to tracking on successful download
+            media_data['user_interactions'].append(msg_info)
+            successful_downloads.append(msg_info)
+            
+        except Exception as e:
+            failed_downloads.append({
+                **msg_info,
+                'error': str(e)
+            })
+            print(f"Error during download of message {msg_info['id']}: {str(e)}")
+
+    async def download_queued_item(msg_info, message, all_reactions, user_interaction):
+        """Download one queued message into all_reactions, then the user directory"""
+        # Doing both in order lets the user copy link to the file just downloaded
+        if all_reactions:
+            await download_all_reactions_item(msg_info, message)
+        if user_interaction:
+            await download_user_interaction_item(msg_info, message)
+
+    async def download_worker(queue):
+        """Download queued messages a batch at a time until the scan's end marker"""
+        done = False
+        while not done:
+            batch = [await queue.get()]
+            # Take whatever else the scan has queued meanwhile, up to a batch,
+            # stopping at an end marker so each worker gets its own
+            while len(batch) < BATCH_SIZE and not queue.empty() and batch[-1] is not None:
+                batch.append(queue.get_nowait())
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            
+            # Entries requeued from the log carry no message; fetch those in one request
+            missing = [msg_info['id'] for msg_info, message, _, _ in batch if message is None]
+            fetched = {}
+            if missing:
+                try:
+                    fetched = dict(zip(missing, await get_messages_batch(client, channel, missing)))
+                except Exception as e:
+                    # Fail just these entries; the rest of the batch and later batches go on
+                    print(f"\nError fetching {len(missing)} logged messages: {str(e)}")
+                    for msg_info, message, _, _ in batch:
+                        if message is None:
+                            failed_downloads.append({
+                                **msg_info,
+                                'error': str(e)
+                            })
+                    batch = [item for item in batch if item[1] is not None]
+            
+            for _, _, all_reactions, user_interaction in batch:
+                progress.total += all_reactions + user_interaction
+            
+            # network_semaphore caps transfers in flight
+            await asyncio.gather(*(
+                download_queued_item(
+                    msg_info,
+                    message if message is not None else fetched[msg_info['id']],
+                    all_reactions,
+                    user_interaction
+                )
+                for msg_info, message, all_reactions, user_interaction in batch
+            ))
+
+    # Downloads start while the scan is still running: the scan queues each
+    # qualifying message and the workers take them in batches. The bounded
+    # queue holds the scan back if downloads fall behind.
+    queue = asyncio.Queue(maxsize=DOWNLOAD_QUEUE_SIZE)
+    workers = [asyncio.create_task(download_worker(queue)) for _ in range(DOWNLOAD_WORKERS)]
+    
+    async def scan_then_stop():
+        """Run the scan, then queue an end marker for each worker"""
+        await get_qualified_messages(channel, log_data, target_user, queue)
+        for _ in workers:
+            await queue.put(None)
+    
+    # A failure anywhere stops the rest; above all, a dead worker cancels the
+    # scan, which would otherwise block on a queue nobody reads
+    tasks = [asyncio.create_task(scan_then_stop()), *workers]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        task.result()
+
+    print("\nDownloads complete!")
+    
+    # Save final state
+    save_checkpoint(log_data, is_final=True)
 
     return media_data, successful_downloads, failed_downloads
 